@@ -0,0 +1,20 @@
+import json
+from typing import Any, Dict
+
+
+def extract_output(response: Any) -> str:
+    """Get the agent output from return_values, falling back to the raw response."""
+    if hasattr(response, 'return_values') and 'output' in response.return_values:
+        return response.return_values['output']
+    return str(response)
+
+
+async def ainvoke_agent(agent: Any, input_dict: Dict[str, Any]) -> str:
+    """Invoke an OpenAI assistant without blocking the event loop and return its output."""
+    response = await agent.ainvoke(input_dict)
+    return extract_output(response)
+
+
+def dump_profile(user_profile: Dict[str, Any]) -> str:
+    """Serialize a user profile for embedding in an agent prompt."""
+    return json.dumps(user_profile, indent=2)
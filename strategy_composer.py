@@ -1,13 +1,51 @@
 import json
 import os
-import subprocess
+import asyncio
 import concurrent.futures
-from typing import Dict, Any, List
-from datetime import datetime, timedelta
-from langchain.agents import AgentExecutor
-from langchain.agents.openai_assistant.base import OpenAIAssistantRunnable
+import orjson
+from functools import cached_property, lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timezone
 from dotenv import load_dotenv
-import re
+from async_agents import dump_profile
+
+@lru_cache(maxsize=32)
+def _load_single_analysis(file_path: str, mtime_ns: int, size: int) -> Tuple[Any, Optional[str]]:
+    """Read an analysis file and return its parsed JSON with the raw JSON text.
+
+    Results are cached per file modification time and size, so the returned
+    value is shared and must not be mutated. The raw text is None when the
+    file holds no valid JSON.
+    """
+    with open(file_path, 'r') as f:
+        content = f.read()
+    json_str = content.strip()
+    # Most analyses are bare JSON, so parse the whole content first unless it
+    # clearly starts with prose or a code fence
+    if json_str.startswith(('{', '[', '"')):
+        try:
+            return orjson.loads(json_str), json_str
+        except orjson.JSONDecodeError:
+            pass
+    # Otherwise look for JSON-like content between the outermost curly braces
+    start = json_str.find('{')
+    end = json_str.rfind('}')
+    if start == -1 or end <= start:
+        print(f"Warning: No JSON content found in {file_path}")
+        return {"raw_content": content}, None
+    json_str = json_str[start:end + 1]
+    try:
+        # stdlib json also accepts NaN/Infinity, which orjson rejects
+        return json.loads(json_str), json_str
+    except json.JSONDecodeError as e:
+        print(f"Warning: Could not parse JSON from {file_path}: {str(e)}")
+        return {"raw_content": content}, None
+
+def _copy_to_dos(value: Any) -> List[Any]:
+    """Copy a to-do list out of a (possibly cached) analysis, wrapping single values."""
+    if isinstance(value, list):
+        return value[:]
+    return [value] if value else []
 
 class StrategyComposer:
     def __init__(self, prompts_dir: str = "prompts"):
@@ -17,108 +55,118 @@ class StrategyComposer:
             "social": os.path.join(prompts_dir, "social_analysis.txt"),
             "integration": os.path.join(prompts_dir, "integration_analysis.txt")
         }
-        self.test_scripts = {
-            "employment": "test_employment.py",
-            "social": "test_social.py",
-            "integration": "test_integration.py"
-        }
+        self.user_profile_file = "user_profile.json"
         # Load environment variables
         load_dotenv()
-        # Initialize strategy assistant
-        self.strategy_assistant = OpenAIAssistantRunnable(
+        # Import the agent wrappers once so every analysis runs in this interpreter
+        import test_employment
+        import test_social
+        import test_integration
+        self.test_callables = {
+            "employment": test_employment.arun_analysis,
+            "social": test_social.arun_analysis,
+            "integration": test_integration.arun_analysis
+        }
+
+    @cached_property
+    def strategy_assistant(self):
+        """Strategy assistant, created on first use so langchain loads only when needed."""
+        from langchain.agents.openai_assistant.base import OpenAIAssistantRunnable
+        return OpenAIAssistantRunnable(
             assistant_id=os.getenv("STRATEGY_ASSISTANT_ID"),
             as_agent=True
         )
 
-    def run_single_script(self, script_type: str, script_name: str) -> tuple:
-        """Run a single test script and return its result."""
+    def load_user_profile(self) -> Dict[str, Any]:
+        """Load the user profile shared by all analysis agents."""
+        with open(self.user_profile_file, 'r') as f:
+            return json.load(f)
+
+    def _write_analysis(self, file_path: str, output: str):
+        """Write a single agent analysis to its file."""
+        with open(file_path, 'w') as f:
+            f.write(output)
+
+    async def _run_one(self, analysis_type: str, arun_analysis, user_profile: Dict[str, Any], profile_json: str) -> tuple:
+        """Run a single analysis agent, save its output and return the result."""
         try:
-            print(f"\nRunning {script_name}...")
-            result = subprocess.run(['python', script_name], 
-                                 capture_output=True, 
-                                 text=True)
-            
-            if result.returncode == 0:
-                print(f"Successfully ran {script_name}")
-                return script_type, True, result.stdout
-            else:
-                print(f"Error running {script_name}:")
-                print(result.stderr)
-                return script_type, False, result.stderr
+            print(f"\nRunning {analysis_type} analysis...")
+            output = await arun_analysis(user_profile, profile_json)
+            await asyncio.to_thread(self._write_analysis, self.analysis_files[analysis_type], output)
+            return analysis_type, True, output
+        except Exception as e:
+            return analysis_type, False, f"Failed to run {analysis_type} analysis: {str(e)}"
+
+    async def _run_all(self) -> List[tuple]:
+        """Load the user profile once and dispatch all analysis agents concurrently."""
+        try:
+            # Keep the blocking profile read off the event loop
+            user_profile = await asyncio.to_thread(self.load_user_profile)
         except Exception as e:
-            error_msg = f"Failed to run {script_name}: {str(e)}"
-            print(error_msg)
-            return script_type, False, error_msg
+            # Without a profile no agent can run; keep any existing analyses
+            error_msg = f"Failed to load user profile {self.user_profile_file}: {str(e)}"
+            return [(script_type, False, error_msg) for script_type in self.test_callables]
+        # Serialize the profile once; the agent prompts differ only in their schema
+        profile_json = dump_profile(user_profile)
+        return await asyncio.gather(*(
+            self._run_one(script_type, arun_analysis, user_profile, profile_json)
+            for script_type, arun_analysis in self.test_callables.items()
+        ))
 
     def run_test_scripts(self):
-        """Run all test scripts in parallel and collect their outputs."""
+        """Run all analysis agents concurrently and collect their outputs."""
         print("Running test scripts in parallel...")
         results = {}
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-            # Submit all scripts to run in parallel
-            future_to_script = {
-                executor.submit(self.run_single_script, script_type, script_name): script_type
-                for script_type, script_name in self.test_scripts.items()
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            outcomes = asyncio.run(self._run_all())
+        else:
+            # Called from inside an event loop, so run ours on a worker thread
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+                outcomes = executor.submit(asyncio.run, self._run_all()).result()
+
+        for script_type, success, output in outcomes:
+            results[script_type] = {
+                "success": success,
+                "output": output
             }
-            
-            # Collect results as they complete
-            for future in concurrent.futures.as_completed(future_to_script):
-                script_type = future_to_script[future]
-                try:
-                    script_type, success, output = future.result()
-                    results[script_type] = {
-                        "success": success,
-                        "output": output
-                    }
-                except Exception as e:
-                    print(f"Error processing {script_type}: {str(e)}")
-                    results[script_type] = {
-                        "success": False,
-                        "output": str(e)
-                    }
         
-        # Print summary of results
+        # Print summary of results once every agent has finished
         print("\nTest Script Execution Summary:")
         for script_type, result in results.items():
-            status = "Success" if result["success"] else "Failed"
-            print(f"{script_type}: {status}")
+            if result["success"]:
+                print(f"{script_type}: Success")
+            else:
+                print(f"{script_type}: Failed - {result['output']}")
         
         return results
 
-    def load_analysis_files(self) -> Dict[str, Any]:
-        """Load and parse all analysis files."""
-        analyses = {}
-        for agent_type, file_path in self.analysis_files.items():
-            try:
-                with open(file_path, 'r') as f:
-                    content = f.read()
-                    try:
-                        # First try to parse the entire content as JSON
-                        analyses[agent_type] = json.loads(content)
-                    except json.JSONDecodeError:
-                        # If that fails, try to find JSON content within the text
-                        try:
-                            # Look for JSON-like content between curly braces
-                            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                            if json_match:
-                                json_str = json_match.group(0)
-                                analyses[agent_type] = json.loads(json_str)
-                            else:
-                                print(f"Warning: No JSON content found in {agent_type} analysis")
-                                analyses[agent_type] = {"raw_content": content}
-                        except Exception as e:
-                            print(f"Warning: Could not parse JSON from {agent_type} analysis: {str(e)}")
-                            analyses[agent_type] = {"raw_content": content}
-            except Exception as e:
-                print(f"Error loading {agent_type} analysis: {str(e)}")
-                analyses[agent_type] = {"error": str(e)}
+    def _read_and_parse(self, agent_type: str, file_path: str) -> Tuple[Any, Optional[str]]:
+        """Load a single analysis file, reusing the cached parse while the file is unchanged."""
+        try:
+            stat = os.stat(file_path)
+            return _load_single_analysis(file_path, stat.st_mtime_ns, stat.st_size)
+        except Exception as e:
+            print(f"Error loading {agent_type} analysis: {str(e)}")
+            return {"error": str(e)}, None
+
+    def load_analysis_files(self) -> Dict[str, Tuple[Any, Optional[str]]]:
+        """Load all analysis files concurrently as (parsed, raw JSON) pairs."""
+        agent_types = list(self.analysis_files)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(agent_types)) as executor:
+            analyses = dict(zip(
+                agent_types,
+                executor.map(self._read_and_parse, agent_types, self.analysis_files.values())
+            ))
         
         # Print loaded analyses for debugging
-        print("\nLoaded analyses:")
-        for agent_type, analysis in analyses.items():
-            print(f"\n{agent_type.upper()} Analysis:")
-            print(json.dumps(analysis, indent=2))
+        if os.environ.get("STRATEGY_DEBUG"):
+            print("\nLoaded analyses:")
+            for agent_type, (analysis, _) in analyses.items():
+                print(f"\n{agent_type.upper()} Analysis:")
+                print(json.dumps(analysis, indent=2))
         
         return analyses
 
@@ -128,128 +176,135 @@ class StrategyComposer:
             return obj.get(key, default)
         return default
 
-    def extract_milestones(self, analyses: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Extract and organize milestones from all analyses."""
+    def extract_milestones(self, analyses: Dict[str, Tuple[Any, Optional[str]]]) -> List[Dict[str, Any]]:
+        """Extract and organize milestones from the (parsed, raw JSON) pairs of load_analysis_files."""
+        analyses = {agent_type: parsed for agent_type, (parsed, _) in analyses.items()}
+        # Parsed analyses are shared through the load cache, so to-do lists are
+        # always copied before they go into a milestone
         milestones = []
         
         # Integration milestones
-        if "integration" in analyses:
-            integration = analyses["integration"]
-            if isinstance(integration, dict):
-                if "integrations_analyse" in integration:
-                    # Language integration
-                    lang = self.safe_get(integration["integrations_analyse"], "sprachliche_integration", {})
-                    if self.safe_get(lang, "bedarf"):
-                        milestones.append({
-                            "title": "Sprache & Aufenthalt klären",
-                            "parallel": False,
-                            "to_dos": [
-                                "BAMF-Integrationskurs beantragen",
-                                "Beratung bei Migrationsstelle vereinbaren"
-                            ],
-                            "optional": ["Online-Deutschkurs vorbereitend nutzen"]
-                        })
-                    
-                    # Job center connection
-                    jobcenter = self.safe_get(integration["integrations_analyse"], "jobcenter_anbindung", {})
-                    if self.safe_get(jobcenter, "status"):
-                        milestones.append({
-                            "title": "Jobcenter & Finanzierung",
-                            "parallel": True,
-                            "to_dos": self.safe_get(jobcenter, "empfehlungen", [])
-                        })
-                    
-                    # Financial support
-                    financial = self.safe_get(integration["integrations_analyse"], "finanzielle_unterstützung", {})
-                    if self.safe_get(financial, "bedarf"):
-                        milestones.append({
-                            "title": "Finanzielle Unterstützung",
-                            "parallel": True,
-                            "to_dos": self.safe_get(financial, "möglichkeiten", [])
-                        })
+        integration = analyses.get("integration")
+        ia = integration.get("integrations_analyse") if isinstance(integration, dict) else None
+        if isinstance(ia, dict):
+            # Language integration
+            lang = ia.get("sprachliche_integration")
+            if isinstance(lang, dict) and lang.get("bedarf"):
+                milestones.append({
+                    "title": "Sprache & Aufenthalt klären",
+                    "parallel": False,
+                    "to_dos": [
+                        "BAMF-Integrationskurs beantragen",
+                        "Beratung bei Migrationsstelle vereinbaren"
+                    ],
+                    "optional": ["Online-Deutschkurs vorbereitend nutzen"]
+                })
+            
+            # Job center connection
+            jobcenter = ia.get("jobcenter_anbindung")
+            if isinstance(jobcenter, dict) and jobcenter.get("status"):
+                milestones.append({
+                    "title": "Jobcenter & Finanzierung",
+                    "parallel": True,
+                    "to_dos": _copy_to_dos(jobcenter.get("empfehlungen"))
+                })
+            
+            # Financial support
+            financial = ia.get("finanzielle_unterstützung")
+            if isinstance(financial, dict) and financial.get("bedarf"):
+                milestones.append({
+                    "title": "Finanzielle Unterstützung",
+                    "parallel": True,
+                    "to_dos": _copy_to_dos(financial.get("möglichkeiten"))
+                })
 
         # Social milestones
-        if "social" in analyses:
-            social = analyses["social"]
-            if isinstance(social, dict):
-                if "soziale_analyse" in social:
-                    # Single parent support
-                    if "alleinerziehend" in social["soziale_analyse"]:
-                        situation = self.safe_get(social["soziale_analyse"], "alleinerziehend", {})
-                        if self.safe_get(situation, "situation"):
-                            milestones.append({
-                                "title": "Kinderbetreuung & Wohnen sichern",
-                                "parallel": True,
-                                "to_dos": [
-                                    "Kitaplatz beantragen",
-                                    "Wohngeldantrag vorbereiten"
-                                ] + self.safe_get(situation, "empfehlungen", [])
-                            })
-                    
-                    # Drug addiction
-                    if "drogenabhängigkeit" in social["soziale_analyse"]:
-                        situation = self.safe_get(social["soziale_analyse"], "drogenabhängigkeit", {})
-                        if self.safe_get(situation, "situation"):
-                            milestones.append({
-                                "title": "Gesundheit & Suchtberatung",
-                                "parallel": True,
-                                "to_dos": self.safe_get(situation, "empfehlungen", [])
-                            })
-                    
-                    # Housing situation
-                    if "wohnverhältnisse" in social["soziale_analyse"]:
-                        situation = self.safe_get(social["soziale_analyse"], "wohnverhältnisse", {})
-                        if self.safe_get(situation, "situation"):
-                            milestones.append({
-                                "title": "Wohnsituation verbessern",
-                                "parallel": True,
-                                "to_dos": self.safe_get(situation, "empfehlungen", [])
-                            })
+        social = analyses.get("social")
+        sa = social.get("soziale_analyse") if isinstance(social, dict) else None
+        if isinstance(sa, dict):
+            # Single parent support
+            situation = sa.get("alleinerziehend")
+            if isinstance(situation, dict) and situation.get("situation"):
+                to_dos = ["Kitaplatz beantragen", "Wohngeldantrag vorbereiten"]
+                extra = situation.get("empfehlungen")
+                if isinstance(extra, list):
+                    to_dos.extend(extra)
+                elif extra:
+                    to_dos.append(extra)
+                milestones.append({
+                    "title": "Kinderbetreuung & Wohnen sichern",
+                    "parallel": True,
+                    "to_dos": to_dos
+                })
+            
+            # Drug addiction
+            situation = sa.get("drogenabhängigkeit")
+            if isinstance(situation, dict) and situation.get("situation"):
+                milestones.append({
+                    "title": "Gesundheit & Suchtberatung",
+                    "parallel": True,
+                    "to_dos": _copy_to_dos(situation.get("empfehlungen"))
+                })
+            
+            # Housing situation
+            situation = sa.get("wohnverhältnisse")
+            if isinstance(situation, dict) and situation.get("situation"):
+                milestones.append({
+                    "title": "Wohnsituation verbessern",
+                    "parallel": True,
+                    "to_dos": _copy_to_dos(situation.get("empfehlungen"))
+                })
 
         # Employment milestones
-        if "employment" in analyses:
-            emp = analyses["employment"]
-            if isinstance(emp, dict):
-                if "analysis" in emp:
-                    # Employment opportunities
-                    for opp in self.safe_get(emp["analysis"], "employment_opportunities", []):
-                        if isinstance(opp, dict):
-                            milestones.append({
-                                "title": "Beruflicher Einstieg",
-                                "parallel": False,
-                                "to_dos": [
-                                    "AVGS-Coaching starten",
-                                    "Lebenslauf erstellen mit Coach"
-                                ] + self.safe_get(opp, "tasks", [])
-                            })
-                    
-                    # Skill gaps
-                    for gap in self.safe_get(emp["analysis"], "skill_gaps", []):
-                        if isinstance(gap, dict):
-                            milestones.append({
-                                "title": f"Qualifizierung: {self.safe_get(gap, 'skill', 'Skill Gap')}",
-                                "parallel": True,
-                                "to_dos": self.safe_get(gap, "improvement_tasks", [])
-                            })
-                    
-                    # Recommendations
-                    recommendations = self.safe_get(emp["analysis"], "recommendations", [])
-                    if recommendations:
-                        milestones.append({
-                            "title": "Zusätzliche Empfehlungen",
-                            "parallel": True,
-                            "to_dos": recommendations
-                        })
+        emp = analyses.get("employment")
+        ea = emp.get("analysis") if isinstance(emp, dict) else None
+        if isinstance(ea, dict):
+            # Employment opportunities
+            for opp in ea.get("employment_opportunities") or ():
+                if isinstance(opp, dict):
+                    to_dos = ["AVGS-Coaching starten", "Lebenslauf erstellen mit Coach"]
+                    extra = opp.get("tasks")
+                    if isinstance(extra, list):
+                        to_dos.extend(extra)
+                    elif extra:
+                        to_dos.append(extra)
+                    milestones.append({
+                        "title": "Beruflicher Einstieg",
+                        "parallel": False,
+                        "to_dos": to_dos
+                    })
+            
+            # Skill gaps
+            for gap in ea.get("skill_gaps") or ():
+                if isinstance(gap, dict):
+                    milestones.append({
+                        "title": f"Qualifizierung: {gap.get('skill', 'Skill Gap')}",
+                        "parallel": True,
+                        "to_dos": _copy_to_dos(gap.get("improvement_tasks"))
+                    })
+            
+            # Recommendations
+            recommendations = ea.get("recommendations")
+            if recommendations:
+                milestones.append({
+                    "title": "Zusätzliche Empfehlungen",
+                    "parallel": True,
+                    "to_dos": _copy_to_dos(recommendations)
+                })
 
         return milestones
 
-    def get_strategy_from_assistant(self, analyses: Dict[str, Any]) -> Dict[str, Any]:
+    def get_strategy_from_assistant(self, analyses: Dict[str, Tuple[Any, Optional[str]]]) -> Dict[str, Any]:
         """Get strategy from the strategy assistant."""
         try:
             print("\nConsulting strategy assistant...")
-            # Prepare input for the assistant
+            # Prepare input for the assistant, re-shipping the validated JSON text
+            # as-is and only encoding analyses that had no usable JSON
             input_data = {
-                "content": json.dumps(analyses)
+                "content": "{" + ",".join(
+                    f'"{agent_type}":{raw if raw is not None else orjson.dumps(parsed).decode()}'
+                    for agent_type, (parsed, raw) in analyses.items()
+                ) + "}"
             }
             
             # Get response from assistant
@@ -263,8 +318,8 @@ class StrategyComposer:
             
             # Try to parse the output as JSON
             try:
-                strategy = json.loads(output)
-            except json.JSONDecodeError:
+                strategy = orjson.loads(output)
+            except orjson.JSONDecodeError:
                 print("Warning: Could not parse assistant output as JSON")
                 strategy = {"raw_output": output}
             
@@ -274,10 +329,27 @@ class StrategyComposer:
             print(f"Error getting strategy from assistant: {str(e)}")
             return {"error": str(e)}
 
-    def create_strategy(self) -> Dict[str, Any]:
-        """Create a comprehensive strategy from all analyses."""
-        # Run test scripts first
-        self.run_test_scripts()
+    def analyses_are_fresh(self) -> bool:
+        """Check whether every analysis file exists and is not older than the user profile."""
+        if not os.path.exists(self.user_profile_file):
+            return False
+        profile_mtime = os.path.getmtime(self.user_profile_file)
+        return all(
+            os.path.exists(file_path) and os.path.getmtime(file_path) >= profile_mtime
+            for file_path in self.analysis_files.values()
+        )
+
+    def create_strategy(self, force: bool = False) -> Dict[str, Any]:
+        """Create a comprehensive strategy from all analyses.
+
+        The agents are only re-run when an analysis is missing or older than
+        the user profile, or when force is set.
+        """
+        if not force and self.analyses_are_fresh():
+            print("Analyses are up to date with the user profile, skipping test scripts")
+        else:
+            # Run test scripts first
+            self.run_test_scripts()
         
         # Load all analyses
         analyses = self.load_analysis_files()
@@ -286,18 +358,16 @@ class StrategyComposer:
         strategy = self.get_strategy_from_assistant(analyses)
         
         # Add metadata
-        strategy.update({
-            "strategy_version": "v1",
-            "created_at": datetime.now().isoformat()
-        })
+        strategy["strategy_version"] = "v1"
+        strategy["created_at"] = datetime.now(timezone.utc).isoformat()
         
         return strategy
 
     def save_strategy(self, strategy: Dict[str, Any], output_file: str = "strategy/strategy.json"):
         """Save the strategy to a JSON file."""
         try:
-            with open(output_file, 'w') as f:
-                json.dump(strategy, f, indent=2)
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(strategy, option=orjson.OPT_INDENT_2))
             print(f"Strategy saved to: {output_file}")
         except Exception as e:
             print(f"Error saving strategy: {str(e)}")
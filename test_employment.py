@@ -1,56 +1,79 @@
 import json
-from langchain.agents.openai_assistant import OpenAIAssistantRunnable
 import os
+from typing import Optional
 from dotenv import load_dotenv
+from async_agents import ainvoke_agent, dump_profile, extract_output
 
 # Load environment variables
 load_dotenv()
 
-# Initialize employment agent
-employment_agent = OpenAIAssistantRunnable(
-    assistant_id=os.getenv("EMPLOYMENT_AGENT_ID"),
-    as_agent=True
-)
+def create_employment_agent():
+    """Create the employment agent, importing langchain lazily.
 
-# Load user profile
-try:
-    with open('user_profile.json', 'r') as f:
-        user_profile = json.load(f)
-        
-    # Format input for agent with JSON format requirement
-    input_dict = {
-        "content": f"""Please analyze the following user profile and provide your analysis in JSON format:
-        {json.dumps(user_profile, indent=2)}
+    Not cached: the assistant's async client is bound to the event loop it
+    first runs on, so every run gets its own agent.
+    """
+    from langchain.agents.openai_assistant import OpenAIAssistantRunnable
+
+    # Initialize employment agent
+    return OpenAIAssistantRunnable(
+        assistant_id=os.getenv("EMPLOYMENT_AGENT_ID"),
+        as_agent=True
+    )
+
+# Static prompt text; the serialized profile is spliced in between
+_PROMPT_HEAD = """Please analyze the following user profile and provide your analysis in JSON format:
+        """
+
+_PROMPT_SCHEMA = """
         
         Your response should be in JSON format with the following structure:
-        {{
-            "analysis": {{
+        {
+            "analysis": {
                 "employment_opportunities": [],
                 "skill_gaps": [],
                 "recommendations": []
-            }}
-        }}"""
+            }
+        }"""
+
+def build_input(user_profile: dict, profile_json: Optional[str] = None) -> dict:
+    """Format the employment analysis request, reusing a pre-serialized profile if given."""
+    if profile_json is None:
+        profile_json = dump_profile(user_profile)
+
+    # Format input for agent with JSON format requirement
+    return {
+        "content": "".join((_PROMPT_HEAD, profile_json, _PROMPT_SCHEMA))
     }
-    
-    # Get agent response
+
+def run_analysis(user_profile: dict, profile_json: Optional[str] = None) -> str:
+    """Run the employment agent on a user profile and return its raw output."""
+    print("\nInvoking agent...")
+    response = create_employment_agent().invoke(build_input(user_profile, profile_json))
+    return extract_output(response)
+
+async def arun_analysis(user_profile: dict, profile_json: Optional[str] = None) -> str:
+    """Async variant of run_analysis used by the strategy composer."""
     print("\nInvoking agent...")
-    response = employment_agent.invoke(input_dict)
-    
-    # Get the output from return_values
-    if hasattr(response, 'return_values') and 'output' in response.return_values:
-        output = response.return_values['output']
-    else:
-        output = str(response)
-    
-    # Print the output
-    print("\nEmployment Agent Analysis:")
-    print("="*50)
-    print(output)
-    
-    # Save to file
-    with open('prompts/employment_analysis.txt', 'w') as f:
-        f.write(output)
-    print("\nSaved analysis to employment_analysis.txt")
-
-except Exception as e:
-    print(f"Error: {str(e)}")
+    return await ainvoke_agent(create_employment_agent(), build_input(user_profile, profile_json))
+
+if __name__ == "__main__":
+    # Load user profile
+    try:
+        with open('user_profile.json', 'r') as f:
+            user_profile = json.load(f)
+
+        output = run_analysis(user_profile)
+
+        # Print the output
+        print("\nEmployment Agent Analysis:")
+        print("="*50)
+        print(output)
+
+        # Save to file
+        with open('prompts/employment_analysis.txt', 'w') as f:
+            f.write(output)
+        print("\nSaved analysis to employment_analysis.txt")
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
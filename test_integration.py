@@ -1,70 +1,93 @@
 import json
-from langchain.agents.openai_assistant import OpenAIAssistantRunnable
 import os
+from typing import Optional
 from dotenv import load_dotenv
+from async_agents import ainvoke_agent, dump_profile, extract_output
 
 # Load environment variables
 load_dotenv()
 
-# Check for required environment variables
-integration_agent_id = os.getenv("INTEGRATION_AGENT_ID")
-if not integration_agent_id:
-    raise ValueError("INTEGRATION_AGENT_ID environment variable is not set. Please check your .env file.")
-
-# Initialize integration agent
-integration_agent = OpenAIAssistantRunnable(
-    assistant_id=integration_agent_id,
-    as_agent=True
-)
-
-# Load user profile
-try:
-    with open('user_profile.json', 'r') as f:
-        user_profile = json.load(f)
-        
-    # Format input for agent with integration analysis categories
-    input_dict = {
-        "content": f"""Please analyze the following user profile and provide your analysis in JSON format:
-        {json.dumps(user_profile, indent=2)}
+def create_integration_agent():
+    """Create the integration agent, importing langchain lazily.
+
+    Not cached: the assistant's async client is bound to the event loop it
+    first runs on, so every run gets its own agent.
+    """
+    from langchain.agents.openai_assistant import OpenAIAssistantRunnable
+
+    # Check for required environment variables
+    integration_agent_id = os.getenv("INTEGRATION_AGENT_ID")
+    if not integration_agent_id:
+        raise ValueError("INTEGRATION_AGENT_ID environment variable is not set. Please check your .env file.")
+
+    # Initialize integration agent
+    return OpenAIAssistantRunnable(
+        assistant_id=integration_agent_id,
+        as_agent=True
+    )
+
+# Static prompt text; the serialized profile is spliced in between
+_PROMPT_HEAD = """Please analyze the following user profile and provide your analysis in JSON format:
+        """
+
+_PROMPT_SCHEMA = """
         
-        {{
-            "integrations_analyse": {{
-                "finanzielle_unterstützung": {{
+        {
+            "integrations_analyse": {
+                "finanzielle_unterstützung": {
                     "bedarf": "",
                     "möglichkeiten": []
-                }},
-                "jobcenter_anbindung": {{
+                },
+                "jobcenter_anbindung": {
                     "status": "",
                     "empfehlungen": []
-                }},
-                "sprachliche_integration": {{
+                },
+                "sprachliche_integration": {
                     "bedarf": "",
                     "kursempfehlungen": []
-                }},
+                },
                 "zusätzliche_unterstützung": []
-            }}
-        }}"""
+            }
+        }"""
+
+def build_input(user_profile: dict, profile_json: Optional[str] = None) -> dict:
+    """Format the integration analysis request, reusing a pre-serialized profile if given."""
+    if profile_json is None:
+        profile_json = dump_profile(user_profile)
+
+    # Format input for agent with integration analysis categories
+    return {
+        "content": "".join((_PROMPT_HEAD, profile_json, _PROMPT_SCHEMA))
     }
-    
-    # Get agent response
+
+def run_analysis(user_profile: dict, profile_json: Optional[str] = None) -> str:
+    """Run the integration agent on a user profile and return its raw output."""
     print("\nInvoking agent...")
-    response = integration_agent.invoke(input_dict)
-    
-    # Get the output from return_values
-    if hasattr(response, 'return_values') and 'output' in response.return_values:
-        output = response.return_values['output']
-    else:
-        output = str(response)
-    
-    # Print the output
-    print("\nIntegration Agent Analysis:")
-    print("="*50)
-    print(output)
-    
-    # Save to file
-    with open('prompts/integration_analysis.txt', 'w') as f:
-        f.write(output)
-    print("\nSaved analysis to integration_analysis.txt")
-
-except Exception as e:
-    print(f"Error: {str(e)}")
+    response = create_integration_agent().invoke(build_input(user_profile, profile_json))
+    return extract_output(response)
+
+async def arun_analysis(user_profile: dict, profile_json: Optional[str] = None) -> str:
+    """Async variant of run_analysis used by the strategy composer."""
+    print("\nInvoking agent...")
+    return await ainvoke_agent(create_integration_agent(), build_input(user_profile, profile_json))
+
+if __name__ == "__main__":
+    # Load user profile
+    try:
+        with open('user_profile.json', 'r') as f:
+            user_profile = json.load(f)
+
+        output = run_analysis(user_profile)
+
+        # Print the output
+        print("\nIntegration Agent Analysis:")
+        print("="*50)
+        print(output)
+
+        # Save to file
+        with open('prompts/integration_analysis.txt', 'w') as f:
+            f.write(output)
+        print("\nSaved analysis to integration_analysis.txt")
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
@@ -1,70 +1,93 @@
 import json
-from langchain.agents.openai_assistant import OpenAIAssistantRunnable
 import os
+from typing import Optional
 from dotenv import load_dotenv
+from async_agents import ainvoke_agent, dump_profile, extract_output
 
 # Load environment variables
 load_dotenv()
 
-# Check for required environment variables
-social_agent_id = os.getenv("SOCIAL_AGENT_ID")
-if not social_agent_id:
-    raise ValueError("SOCIAL_AGENT_ID environment variable is not set. Please check your .env file.")
-
-# Initialize social agent
-social_agent = OpenAIAssistantRunnable(
-    assistant_id=social_agent_id,
-    as_agent=True
-)
-
-# Load user profile
-try:
-    with open('user_profile.json', 'r') as f:
-        user_profile = json.load(f)
-        
-    # Format input for agent with social analysis categories
-    input_dict = {
-        "content": f"""Please analyze the following user profile and provide your analysis in JSON format:
-        {json.dumps(user_profile, indent=2)}
+def create_social_agent():
+    """Create the social agent, importing langchain lazily.
+
+    Not cached: the assistant's async client is bound to the event loop it
+    first runs on, so every run gets its own agent.
+    """
+    from langchain.agents.openai_assistant import OpenAIAssistantRunnable
+
+    # Check for required environment variables
+    social_agent_id = os.getenv("SOCIAL_AGENT_ID")
+    if not social_agent_id:
+        raise ValueError("SOCIAL_AGENT_ID environment variable is not set. Please check your .env file.")
+
+    # Initialize social agent
+    return OpenAIAssistantRunnable(
+        assistant_id=social_agent_id,
+        as_agent=True
+    )
+
+# Static prompt text; the serialized profile is spliced in between
+_PROMPT_HEAD = """Please analyze the following user profile and provide your analysis in JSON format:
+        """
+
+_PROMPT_SCHEMA = """
         
-        {{
-            "soziale_analyse": {{
-                "alleinerziehend": {{
+        {
+            "soziale_analyse": {
+                "alleinerziehend": {
                     "situation": "",
                     "empfehlungen": []
-                }},
-                "drogenabhängigkeit": {{
+                },
+                "drogenabhängigkeit": {
                     "situation": "",
                     "empfehlungen": []
-                }},
-                "wohnverhältnisse": {{
+                },
+                "wohnverhältnisse": {
                     "situation": "",
                     "empfehlungen": []
-                }},
+                },
                 "zusätzliche_unterstützung": []
-            }}
-        }}"""
+            }
+        }"""
+
+def build_input(user_profile: dict, profile_json: Optional[str] = None) -> dict:
+    """Format the social analysis request, reusing a pre-serialized profile if given."""
+    if profile_json is None:
+        profile_json = dump_profile(user_profile)
+
+    # Format input for agent with social analysis categories
+    return {
+        "content": "".join((_PROMPT_HEAD, profile_json, _PROMPT_SCHEMA))
     }
-    
-    # Get agent response
+
+def run_analysis(user_profile: dict, profile_json: Optional[str] = None) -> str:
+    """Run the social agent on a user profile and return its raw output."""
     print("\nInvoking agent...")
-    response = social_agent.invoke(input_dict)
-    
-    # Get the output from return_values
-    if hasattr(response, 'return_values') and 'output' in response.return_values:
-        output = response.return_values['output']
-    else:
-        output = str(response)
-    
-    # Print the output
-    print("\nSocial Agent Analysis:")
-    print("="*50)
-    print(output)
-    
-    # Save to file
-    with open('prompts/social_analysis.txt', 'w') as f:
-        f.write(output)
-    print("\nSaved analysis to social_analysis.txt")
-
-except Exception as e:
-    print(f"Error: {str(e)}")
+    response = create_social_agent().invoke(build_input(user_profile, profile_json))
+    return extract_output(response)
+
+async def arun_analysis(user_profile: dict, profile_json: Optional[str] = None) -> str:
+    """Async variant of run_analysis used by the strategy composer."""
+    print("\nInvoking agent...")
+    return await ainvoke_agent(create_social_agent(), build_input(user_profile, profile_json))
+
+if __name__ == "__main__":
+    # Load user profile
+    try:
+        with open('user_profile.json', 'r') as f:
+            user_profile = json.load(f)
+
+        output = run_analysis(user_profile)
+
+        # Print the output
+        print("\nSocial Agent Analysis:")
+        print("="*50)
+        print(output)
+
+        # Save to file
+        with open('prompts/social_analysis.txt', 'w') as f:
+            f.write(output)
+        print("\nSaved analysis to social_analysis.txt")
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from strategy_composer import StrategyComposer
+
+
+class StubAssistant:
+    """Records the input it receives and answers with a fixed JSON strategy."""
+
+    def __init__(self, output='{"milestones": []}'):
+        self.output = output
+        self.inputs = []
+
+    def invoke(self, input_data):
+        self.inputs.append(input_data)
+        return SimpleNamespace(return_values={"output": self.output})
+
+
+@pytest.fixture
+def composer(tmp_path):
+    composer = StrategyComposer(prompts_dir=str(tmp_path))
+    composer.user_profile_file = str(tmp_path / "user_profile.json")
+    return composer
+
+
+def write(path, content, mtime=None):
+    with open(path, 'w') as f:
+        f.write(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def write_analyses(composer, contents, mtime=None):
+    for agent_type, content in contents.items():
+        write(composer.analysis_files[agent_type], content, mtime)
+
+
+# Freshness check
+
+def test_analyses_fresh_when_newer_than_profile(composer):
+    write(composer.user_profile_file, "{}", mtime=1000)
+    write_analyses(composer, {t: "{}" for t in composer.analysis_files}, mtime=2000)
+    assert composer.analyses_are_fresh()
+
+
+def test_analyses_stale_when_one_is_older_than_profile(composer):
+    write(composer.user_profile_file, "{}", mtime=1000)
+    write_analyses(composer, {t: "{}" for t in composer.analysis_files}, mtime=2000)
+    os.utime(composer.analysis_files["social"], (500, 500))
+    assert not composer.analyses_are_fresh()
+
+
+def test_analyses_stale_when_one_is_missing(composer):
+    write(composer.user_profile_file, "{}", mtime=1000)
+    write_analyses(composer, {"employment": "{}", "social": "{}"}, mtime=2000)
+    assert not composer.analyses_are_fresh()
+
+
+def test_analyses_stale_without_profile(composer):
+    write_analyses(composer, {t: "{}" for t in composer.analysis_files}, mtime=2000)
+    assert not composer.analyses_are_fresh()
+
+
+# Parse fallbacks
+
+@pytest.mark.parametrize("content, parsed, raw", [
+    ('  {"a": 1}\n', {"a": 1}, '{"a": 1}'),
+    ('Here is the analysis:\n{"a": [1, 2]}\nThanks!', {"a": [1, 2]}, '{"a": [1, 2]}'),
+    ('```json\n{"a": 1}\n```', {"a": 1}, '{"a": 1}'),
+    ('[{"a": 1}, {"b": 2}]', [{"a": 1}, {"b": 2}], '[{"a": 1}, {"b": 2}]'),
+    ('"just a string"', "just a string", '"just a string"'),
+])
+def test_parse_json_content(composer, content, parsed, raw):
+    write(composer.analysis_files["employment"], content)
+    assert composer.load_analysis_files()["employment"] == (parsed, raw)
+
+
+def test_parse_accepts_nan_through_fallback(composer):
+    write(composer.analysis_files["employment"], '{"score": NaN}')
+    parsed, raw = composer.load_analysis_files()["employment"]
+    assert parsed["score"] != parsed["score"]
+    assert raw == '{"score": NaN}'
+
+
+@pytest.mark.parametrize("content", ["no json here", "{not: valid}"])
+def test_parse_keeps_raw_content_without_valid_json(composer, content):
+    write(composer.analysis_files["employment"], content)
+    assert composer.load_analysis_files()["employment"] == ({"raw_content": content}, None)
+
+
+def test_missing_analysis_file_is_reported(composer):
+    parsed, raw = composer.load_analysis_files()["employment"]
+    assert "error" in parsed and raw is None
+
+
+# Cache invalidation
+
+def test_rewrite_with_same_mtime_is_not_served_from_cache(composer):
+    path = composer.analysis_files["employment"]
+    write(path, '{"a": 1}', mtime=1000)
+    assert composer.load_analysis_files()["employment"][0] == {"a": 1}
+    write(path, '{"a": 22}', mtime=1000)
+    assert composer.load_analysis_files()["employment"][0] == {"a": 22}
+
+
+def test_mutating_milestones_does_not_touch_cached_analyses(composer):
+    write_analyses(composer, {
+        "employment": json.dumps({"analysis": {"recommendations": ["r"]}}),
+        "social": json.dumps({"soziale_analyse": {
+            "wohnverhältnisse": {"situation": "eng", "empfehlungen": ["WBS beantragen"]}
+        }}),
+        "integration": "{}",
+    })
+    for milestone in composer.extract_milestones(composer.load_analysis_files()):
+        milestone["to_dos"].append("mutated")
+
+    milestones = composer.extract_milestones(composer.load_analysis_files())
+    assert [m["to_dos"] for m in milestones] == [["WBS beantragen"], ["r"]]
+
+
+def test_string_to_dos_are_wrapped_not_split(composer):
+    write_analyses(composer, {
+        "employment": json.dumps({"analysis": {"recommendations": "Netzwerken"}}),
+        "social": "{}",
+        "integration": json.dumps({"integrations_analyse": {
+            "jobcenter_anbindung": {"status": "ja", "empfehlungen": "Termin vereinbaren"}
+        }}),
+    })
+    milestones = composer.extract_milestones(composer.load_analysis_files())
+    assert [m["to_dos"] for m in milestones] == [["Termin vereinbaren"], ["Netzwerken"]]
+
+
+# Strategy assistant payload
+
+def test_strategy_payload_reuses_raw_json(composer):
+    write_analyses(composer, {
+        "employment": 'Analysis:\n{"analysis": {"recommendations": ["Überblick"]}}',
+        "social": '{ "soziale_analyse": {} }',
+        "integration": "no json here",
+    })
+    assistant = StubAssistant()
+    composer.__dict__["strategy_assistant"] = assistant
+
+    strategy = composer.get_strategy_from_assistant(composer.load_analysis_files())
+
+    content = assistant.inputs[0]["content"]
+    assert '"employment":{"analysis": {"recommendations": ["Überblick"]}}' in content
+    assert '"social":{ "soziale_analyse": {} }' in content
+    assert json.loads(content) == {
+        "employment": {"analysis": {"recommendations": ["Überblick"]}},
+        "social": {"soziale_analyse": {}},
+        "integration": {"raw_content": "no json here"},
+    }
+    assert strategy == {"milestones": []}
+
+
+def test_strategy_keeps_unparseable_assistant_output(composer):
+    write_analyses(composer, {t: "{}" for t in composer.analysis_files})
+    composer.__dict__["strategy_assistant"] = StubAssistant(output="not json")
+    assert composer.get_strategy_from_assistant(composer.load_analysis_files()) == {"raw_output": "not json"}
+
+
+# Milestone extraction
+
+def test_string_extras_are_appended_not_split(composer):
+    write_analyses(composer, {
+        "employment": json.dumps({"analysis": {
+            "employment_opportunities": [{"tasks": "Bewerbung schreiben"}]
+        }}),
+        "social": json.dumps({"soziale_analyse": {
+            "alleinerziehend": {"situation": "ja", "empfehlungen": "Elterngeld beantragen"}
+        }}),
+        "integration": "{}",
+    })
+    milestones = composer.extract_milestones(composer.load_analysis_files())
+    assert [m["to_dos"] for m in milestones] == [
+        ["Kitaplatz beantragen", "Wohngeldantrag vorbereiten", "Elterngeld beantragen"],
+        ["AVGS-Coaching starten", "Lebenslauf erstellen mit Coach", "Bewerbung schreiben"],
+    ]
+
+
+# Agent orchestration
+
+def stub_agents(composer, failing=()):
+    """Replace the agent callables with coroutines that echo the profile name."""
+    calls = []
+
+    def make(agent_type):
+        async def arun_analysis(user_profile, profile_json):
+            calls.append((agent_type, user_profile, profile_json))
+            if agent_type in failing:
+                raise RuntimeError("assistant unavailable")
+            return json.dumps({"agent": agent_type, "name": user_profile["name"]})
+        return arun_analysis
+
+    composer.test_callables = {agent_type: make(agent_type) for agent_type in composer.analysis_files}
+    return calls
+
+
+def test_failing_agent_does_not_stop_the_others(composer):
+    write(composer.user_profile_file, '{"name": "Ana"}')
+    calls = stub_agents(composer, failing=("social",))
+
+    results = composer.run_test_scripts()
+
+    assert {t: r["success"] for t, r in results.items()} == {
+        "employment": True, "social": False, "integration": True
+    }
+    assert "assistant unavailable" in results["social"]["output"]
+    assert not os.path.exists(composer.analysis_files["social"])
+    with open(composer.analysis_files["employment"]) as f:
+        assert json.load(f) == {"agent": "employment", "name": "Ana"}
+    # Every agent receives the same profile, serialized once
+    assert {profile_json for _, _, profile_json in calls} == {json.dumps({"name": "Ana"}, indent=2)}
+
+
+def test_missing_profile_fails_every_agent_without_writing(composer):
+    calls = stub_agents(composer)
+
+    results = composer.run_test_scripts()
+
+    assert all(not r["success"] for r in results.values())
+    assert all("Failed to load user profile" in r["output"] for r in results.values())
+    assert calls == []
+    assert not any(os.path.exists(p) for p in composer.analysis_files.values())
+
+
+def test_run_test_scripts_inside_running_event_loop(composer):
+    write(composer.user_profile_file, '{"name": "Ana"}')
+    stub_agents(composer)
+
+    async def caller():
+        return composer.run_test_scripts()
+
+    results = asyncio.run(caller())
+
+    assert all(r["success"] for r in results.values())
+    assert all(os.path.exists(p) for p in composer.analysis_files.values())